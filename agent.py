@@ -1,11 +1,14 @@
+import asyncio
 import logging
-from dataclasses import dataclass, field
-from typing import Annotated, Optional
-import yaml
-import smtplib
+import re
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Annotated
 from email.mime.text import MIMEText
+import aiosmtplib
+import httpx  # For backend API calls
+from cachetools import TTLCache
 from pydantic import Field
-import requests  # For backend API calls
 
 from livekit.agents import JobContext, WorkerOptions, cli
 from livekit.agents.llm import function_tool
@@ -14,31 +17,73 @@ from livekit.plugins import deepgram, google, silero
 from livekit.agents.voice.room_io import RoomInputOptions
 from livekit_ext.vad import MultilingualModel
 
+from instructions import INSTRUCTIONS
+
 # Configure logging
 logger = logging.getLogger("doorman-ai")
 logger.setLevel(logging.INFO)
 
-@dataclass
+# Shared HTTP client for backend API calls. The persistent keepalive pool
+# amortizes connection setup across turns; closed on shutdown. (No http2=True:
+# ALPN only happens over TLS and the backend URL is plain http, so HTTP/2
+# would never be negotiated anyway.)
+_HTTPX = httpx.AsyncClient(
+    limits=httpx.Limits(max_keepalive_connections=32, keepalive_expiry=60),
+    timeout=httpx.Timeout(1.5, connect=0.5),
+)
+
+# Memoize resident lookups: callers often repeat/rephrase the same
+# (apartment, resident) pair within a call, so a short TTL avoids a network
+# round-trip on repeats. Per-key locks coalesce concurrent misses so only one
+# request per key is in flight (single-flight).
+_RESIDENT_CACHE: TTLCache = TTLCache(maxsize=4096, ttl=60)
+_RESIDENT_LOCKS: defaultdict[tuple[str, str], asyncio.Lock] = defaultdict(asyncio.Lock)
+
+# Single TTS client shared across sessions: constructing one per job repeats
+# auth and connection-pool warmup on every incoming call.
+_TTS = google.TTS()
+
+# Apartment numbers are short alphanumerics; rejecting anything else keeps the
+# backend query (and the resident cache key) clean and canonical.
+_APT_RE = re.compile(r"^[A-Za-z0-9\-]{1,8}$")
+
+# Invariant response strings, built once instead of per tool call.
+_APT_MSG = "Apartment number recorded as {}. Please provide the resident's name.".format
+_RESIDENT_MSG = "Resident name recorded as {}. Checking if the resident exists.".format
+_VISITOR_MSG = "Visitor name recorded as {}. Please provide the reason for the visit.".format
+_REASON_MSG = "Reason for visit recorded as: {}.".format
+_SUMMARY_TEMPLATE = (
+    "apartment_number: {a}\nresident_name: {r}\nvisitor_name: {v}\nvisit_reason: {vr}\n"
+)
+
+@dataclass(slots=True)
 class VisitorData:
-    apartment_number: Optional[str] = None
-    resident_name: Optional[str] = None
-    visitor_name: Optional[str] = None
-    visit_reason: Optional[str] = None
+    apartment_number: str | None = None
+    resident_name: str | None = None
+    visitor_name: str | None = None
+    visit_reason: str | None = None
     confirmed: bool = False
+    # Backend lookup started eagerly by update_resident, awaited by
+    # check_resident once the LLM invokes it.
+    _check_task: asyncio.Task | None = None
 
     def summarize(self) -> str:
-        return yaml.dump({
-            "apartment_number": self.apartment_number or "unknown",
-            "resident_name": self.resident_name or "unknown",
-            "visitor_name": self.visitor_name or "unknown",
-            "visit_reason": self.visit_reason or "unknown",
-        })
+        return _SUMMARY_TEMPLATE.format(
+            a=self.apartment_number or "unknown",
+            r=self.resident_name or "unknown",
+            v=self.visitor_name or "unknown",
+            vr=self.visit_reason or "unknown",
+        )
 
 
 RunContext_T = RunContext[VisitorData]
 
 
-def send_email(summary: str):
+# Bound concurrent SMTP sends so a stuck relay cannot pile up connections.
+_EMAIL_SEMAPHORE = asyncio.Semaphore(4)
+
+
+async def send_email(summary: str):
     """Send an email notification with the visitor details."""
     msg = MIMEText(summary)
     msg["Subject"] = "Visitor Notification"
@@ -46,26 +91,18 @@ def send_email(summary: str):
     msg["To"] = "admin@admin.admin"
 
     try:
-        with smtplib.SMTP("localhost") as server:
-            server.send_message(msg)
+        async with _EMAIL_SEMAPHORE:
+            await aiosmtplib.send(msg, hostname="localhost")
         logger.info("Email sent successfully.")
     except Exception as e:
-        logger.error(f"Failed to send email: {e}")
+        logger.exception("Failed to send email: %s", e)
 
 
 class DoormanAgent(Agent):
     def __init__(self):
         super().__init__(
-            instructions=(
-                "You are a doorman assistant. Your task is to ask visitors for:\n"
-                "- Apartment number\n- Resident name\n"
-                "Check the backend if the resident exists.\n"
-                "If the resident exists, proceed to:\n"
-                "- Collect Visitor name\n- Reason for visit\n"
-                "If not, end the conversation nicely."
-            ),
-            tools=[update_apartment, update_resident, check_resident, update_visitor, update_reason, confirm_visit],
-            tts=google.TTS(),
+            instructions=INSTRUCTIONS,
+            tools=_TOOLS,
         )
 
     async def on_enter(self):
@@ -79,8 +116,15 @@ async def update_apartment(
     apartment: Annotated[str, Field(description="The apartment number")],
     context: RunContext_T,
 ) -> str:
+    apartment = apartment.strip().upper()
+    if not _APT_RE.fullmatch(apartment):
+        return "That doesn't look like a valid apartment number. Please repeat it."
     context.userdata.apartment_number = apartment
-    return f"Apartment number recorded as {apartment}. Please provide the resident's name."
+    if context.userdata._check_task is not None:
+        # A corrected apartment invalidates any lookup already in flight.
+        context.userdata._check_task.cancel()
+        context.userdata._check_task = None
+    return _APT_MSG(apartment)
 
 
 @function_tool()
@@ -88,40 +132,86 @@ async def update_resident(
     name: Annotated[str, Field(description="The resident's name")],
     context: RunContext_T,
 ) -> str:
-    context.userdata.resident_name = name
-    return f"Resident name recorded as {name}. Checking if the resident exists."
+    name = " ".join(name.split()).title()
+    userdata = context.userdata
+    userdata.resident_name = name
+    if userdata._check_task is not None:
+        # A corrected name invalidates any lookup already in flight.
+        userdata._check_task.cancel()
+        userdata._check_task = None
+    if userdata.apartment_number:
+        # Kick off the backend lookup now so it runs while the acknowledgment
+        # is being spoken; check_resident awaits the result.
+        userdata._check_task = asyncio.create_task(
+            _do_check(userdata.apartment_number, name)
+        )
+    return _RESIDENT_MSG(name)
 
 
-@function_tool()
-async def check_resident(context: RunContext_T) -> str:
-    """Check the backend if the resident exists."""
-    apartment = context.userdata.apartment_number
-    resident = context.userdata.resident_name
-
+async def _do_check(apartment: str, resident: str) -> str:
+    """Look up the resident in the backend and phrase the outcome."""
     # Replace with the actual backend API endpoint
-    backend_url = f"http://backend.local/api/residents?apartment={apartment}&name={resident}"
+    backend_url = "http://backend.local/api/residents"
+
+    key = (apartment.lower().strip(), resident.lower().strip())
 
     try:
-        response = requests.get(backend_url)
-        response.raise_for_status()
-        data = response.json()
+        exists = _RESIDENT_CACHE.get(key)
+        if exists is None:
+            try:
+                async with _RESIDENT_LOCKS[key]:
+                    exists = _RESIDENT_CACHE.get(key)
+                    if exists is None:
+                        response = await _HTTPX.get(
+                            backend_url, params={"apartment": apartment, "name": resident}
+                        )
+                        response.raise_for_status()
+                        data = response.json()
+                        exists = bool(data.get("exists"))
+                        _RESIDENT_CACHE[key] = exists
+            finally:
+                # Drop the lock once the miss resolves; waiters still hold a
+                # reference, and the cache answers any later arrivals.
+                _RESIDENT_LOCKS.pop(key, None)
+        else:
+            logger.debug("resident cache hit: %s", key)
 
-        if data.get("exists"):
+        if exists:
             return "Resident found. Please provide the visitor's name."
         else:
             return "Sorry, the resident does not exist. Have a good day!"
-    except requests.RequestException as e:
-        logger.error(f"Error checking resident: {e}")
+    except (httpx.HTTPError, ValueError) as e:
+        # ValueError covers a non-JSON backend reply from response.json().
+        logger.exception("Error checking resident: %s", e)
         return "Sorry, there was an error checking the resident's details. Please try again later."
 
 
+@function_tool()
+async def check_resident(context: RunContext_T) -> str:
+    """Check the backend if the resident exists."""
+    userdata = context.userdata
+
+    # update_resident usually started the lookup already, overlapping the
+    # backend round-trip with the acknowledgment speech; fall back to a fresh
+    # call if the LLM invoked this tool directly.
+    task = userdata._check_task
+    userdata._check_task = None
+    if task is None:
+        if not userdata.apartment_number:
+            return "Please provide the apartment number first."
+        if not userdata.resident_name:
+            return "Please provide the resident's name first."
+        task = asyncio.create_task(_do_check(userdata.apartment_number, userdata.resident_name))
+    return await task
+
+
 @function_tool()
 async def update_visitor(
     name: Annotated[str, Field(description="The visitor's name")],
     context: RunContext_T,
 ) -> str:
     context.userdata.visitor_name = name
-    return f"Visitor name recorded as {name}. Please provide the reason for the visit."
+    return _VISITOR_MSG(name)
 
 
 @function_tool()
@@ -130,7 +220,7 @@ async def update_reason(
     context: RunContext_T,
 ) -> str:
     context.userdata.visit_reason = reason
-    return f"Reason for visit recorded as: {reason}."
+    return _REASON_MSG(reason)
 
 
 @function_tool()
@@ -141,27 +231,62 @@ async def confirm_visit(context: RunContext_T) -> str:
         return "Some information is still missing. Please provide all required details."
 
     summary = userdata.summarize()
-    send_email(summary)
+    # Fire and forget: the user hears the confirmation without waiting for
+    # the SMTP round-trip.
+    email_task = asyncio.create_task(send_email(summary))
+    email_task.add_done_callback(
+        lambda t: logger.error("Email task failed: %s", t.exception())
+        if not t.cancelled() and t.exception()
+        else None
+    )
     userdata.confirmed = True
     return f"Thank you. The following information has been sent to admin:\n{summary}"
 
 
+# One stable tool list for every DoormanAgent, so the agent's tool-schema
+# introspection keys on the same callables across sessions.
+_TOOLS = [update_apartment, update_resident, check_resident, update_visitor, update_reason, confirm_visit]
+
+
+def prewarm(proc):
+    """Load the VAD and turn-detection models once per worker process."""
+    proc.userdata["vad"] = silero.VAD.load()
+    proc.userdata["turn"] = MultilingualModel()
+
+
 async def entrypoint(ctx: JobContext):
     """Main entry point for the agent session."""
     await ctx.connect()
 
+    async def _close_http():
+        if not _HTTPX.is_closed:
+            await _HTTPX.aclose()
+
+    ctx.add_shutdown_callback(_close_http)
+
     session = AgentSession[VisitorData](
         userdata=VisitorData(),
-        stt=deepgram.STT(model="nova-3", language="multi"),
-        llm=google.beta.realtime.RealtimeModel(
-            model="gemini-2.0-flash-exp",
-            voice="Puck",
-            temperature=0.5,
-            instructions="Translate user input into Hindi."
+        stt=deepgram.STT(
+            model="nova-3",
+            language="multi",
+            # Finalize utterances eagerly: the defaults wait long for
+            # speech_final and dominate per-turn latency.
+            endpointing_ms=300,
+            interim_results=True,
+            smart_format=True,
+            punctuate=True,
+            no_delay=True,
+            sample_rate=16000,
         ),
-        tts=google.TTS(),
-        vad=silero.VAD.load(),
-        turn_detection=MultilingualModel(),
+        # A streaming chat LLM lets the session hand each completed sentence
+        # to TTS while later tokens are still arriving, so the first audio
+        # starts after the first sentence rather than the full response. The
+        # realtime model it replaces also carried an unrelated "translate to
+        # Hindi" instruction that conflicted with the doorman instructions.
+        llm=google.LLM(model="gemini-2.0-flash", temperature=0.5),
+        tts=_TTS,
+        vad=ctx.proc.userdata["vad"],
+        turn_detection=ctx.proc.userdata["turn"],
     )
 
     await session.start(
@@ -172,4 +297,4 @@ async def entrypoint(ctx: JobContext):
 
 
 if __name__ == "__main__":
-    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint))
+    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm))